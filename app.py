@@ -6,7 +6,10 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import time
+import copy
 import warnings
+from notifications import AlertDispatcher, sinks_from_env
+from sketches import KPISketchStore
 warnings.filterwarnings('ignore')
 
 # Page configuration
@@ -97,18 +100,21 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Default thresholds; notifications always use these so every session agrees
+DEFAULT_KPI_THRESHOLDS = {
+    'Revenue': {'target': 1000000.0, 'warning_low': 900000.0, 'critical_low': 800000.0},
+    'Profit_Margin': {'target': 25.0, 'warning_low': 20.0, 'critical_low': 15.0},
+    'Customer_Acquisition_Cost': {'target': 100.0, 'warning_high': 150.0, 'critical_high': 200.0},
+    'Customer_Lifetime_Value': {'target': 2000.0, 'warning_low': 1600.0, 'critical_low': 1200.0},
+    'Cash_Flow': {'target': 500000.0, 'warning_low': 300000.0, 'critical_low': 100000.0},
+    'ROI': {'target': 20.0, 'warning_low': 15.0, 'critical_low': 10.0},
+    'Market_Share': {'target': 15.0, 'warning_low': 12.0, 'critical_low': 10.0},
+    'Customer_Satisfaction': {'target': 4.5, 'warning_low': 4.0, 'critical_low': 3.5}
+}
+
 # Initialize session state for thresholds
 if 'kpi_thresholds' not in st.session_state:
-    st.session_state.kpi_thresholds = {
-        'Revenue': {'target': 1000000.0, 'warning_low': 900000.0, 'critical_low': 800000.0},
-        'Profit_Margin': {'target': 25.0, 'warning_low': 20.0, 'critical_low': 15.0},
-        'Customer_Acquisition_Cost': {'target': 100.0, 'warning_high': 150.0, 'critical_high': 200.0},
-        'Customer_Lifetime_Value': {'target': 2000.0, 'warning_low': 1600.0, 'critical_low': 1200.0},
-        'Cash_Flow': {'target': 500000.0, 'warning_low': 300000.0, 'critical_low': 100000.0},
-        'ROI': {'target': 20.0, 'warning_low': 15.0, 'critical_low': 10.0},
-        'Market_Share': {'target': 15.0, 'warning_low': 12.0, 'critical_low': 10.0},
-        'Customer_Satisfaction': {'target': 4.5, 'warning_low': 4.0, 'critical_low': 3.5}
-    }
+    st.session_state.kpi_thresholds = copy.deepcopy(DEFAULT_KPI_THRESHOLDS)
 
 if 'alerts_log' not in st.session_state:
     st.session_state.alerts_log = []
@@ -179,8 +185,10 @@ def generate_kpi_data():
     return pd.DataFrame(data)
 
 # KPI status evaluation
-def evaluate_kpi_status(value, kpi_name):
-    thresholds = st.session_state.kpi_thresholds.get(kpi_name, {})
+def evaluate_kpi_status(value, kpi_name, kpi_thresholds=None):
+    if kpi_thresholds is None:
+        kpi_thresholds = st.session_state.kpi_thresholds
+    thresholds = kpi_thresholds.get(kpi_name, {})
     
     if not thresholds:
         return 'normal', 'No thresholds defined'
@@ -200,6 +208,20 @@ def evaluate_kpi_status(value, kpi_name):
         else:
             return 'normal', f'Meeting or exceeding target'
 
+# Alert notification dispatcher, shared across all sessions
+@st.cache_resource
+def get_alert_dispatcher():
+    return AlertDispatcher(sinks_from_env()).start()
+
+# Pre-binned distribution sketches per KPI and day, merged per analysis window
+@st.cache_resource
+def get_kpi_sketches():
+    return KPISketchStore.from_frame(
+        generate_kpi_data(),
+        ['Revenue', 'Profit_Margin', 'Customer_Acquisition_Cost', 'Customer_Lifetime_Value',
+         'Cash_Flow', 'ROI', 'Market_Share', 'Customer_Satisfaction']
+    )
+
 # Load data
 df = generate_kpi_data()
 
@@ -244,18 +266,25 @@ if auto_refresh:
 latest_data = df_filtered.iloc[-1] if len(df_filtered) > 0 else df.iloc[-1]
 
 # Check for active alerts
-active_alerts = []
-for kpi in ['Revenue', 'Profit_Margin', 'Customer_Acquisition_Cost', 'Customer_Lifetime_Value', 
-            'Cash_Flow', 'ROI', 'Market_Share', 'Customer_Satisfaction']:
-    if kpi in latest_data:
-        status, message = evaluate_kpi_status(latest_data[kpi], kpi)
-        if status != 'normal':
-            active_alerts.append({
-                'KPI': kpi,
-                'Status': status,
-                'Current_Value': latest_data[kpi],
-                'Message': message
-            })
+def find_active_alerts(row, kpi_thresholds=None):
+    alerts = []
+    for kpi in ['Revenue', 'Profit_Margin', 'Customer_Acquisition_Cost', 'Customer_Lifetime_Value', 
+                'Cash_Flow', 'ROI', 'Market_Share', 'Customer_Satisfaction']:
+        if kpi in row:
+            status, message = evaluate_kpi_status(row[kpi], kpi, kpi_thresholds)
+            if status != 'normal':
+                alerts.append({
+                    'KPI': kpi,
+                    'Status': status,
+                    'Current_Value': row[kpi],
+                    'Message': message
+                })
+    return alerts
+
+active_alerts = find_active_alerts(latest_data)
+
+# Notifications are evaluated on shared state only, never on per-session thresholds or filters
+get_alert_dispatcher().submit(find_active_alerts(df.iloc[-1], DEFAULT_KPI_THRESHOLDS), as_of=df.iloc[-1]['Date'])
 
 # Main tabs
 tab1, tab2, tab3, tab4 = st.tabs(["Live Dashboard", "Alert Management", "Trend Analysis", "Performance Reports"])
@@ -505,6 +534,9 @@ with tab3:
          'Cash_Flow', 'ROI', 'Market_Share', 'Customer_Satisfaction']
     )
     
+    kpi_hist, kpi_quantiles = get_kpi_sketches().window(selected_kpi, start_date)
+    p10, median, p90 = kpi_quantiles.quantiles([0.1, 0.5, 0.9])
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -530,14 +562,20 @@ with tab3:
         st.plotly_chart(fig_trend, use_container_width=True)
     
     with col2:
-        fig_dist = px.histogram(
-            df_filtered,
-            x=selected_kpi,
+        bin_edges, bin_counts = kpi_hist.nonempty()
+        fig_dist = go.Figure(go.Bar(
+            x=(bin_edges[:-1] + bin_edges[1:]) / 2,
+            y=bin_counts,
+            width=np.diff(bin_edges)
+        ))
+        fig_dist.update_layout(
             title=f"{selected_kpi} Distribution",
             template="plotly_white",
-            nbins=30
+            xaxis_title=selected_kpi,
+            yaxis_title="count",
+            bargap=0,
+            height=400
         )
-        fig_dist.update_layout(height=400)
         st.plotly_chart(fig_dist, use_container_width=True)
     
     # Statistics
@@ -548,7 +586,7 @@ with tab3:
         <div class="metric-summary">
             <h4>Current Performance</h4>
             <p><strong>Current:</strong> {latest_data[selected_kpi]:.2f}</p>
-            <p><strong>Average:</strong> {df_filtered[selected_kpi].mean():.2f}</p>
+            <p><strong>Average:</strong> {kpi_hist.mean():.2f}</p>
             <p><strong>Change:</strong> {((latest_data[selected_kpi] - df_filtered[selected_kpi].iloc[0]) / df_filtered[selected_kpi].iloc[0] * 100):.1f}%</p>
         </div>
         """, unsafe_allow_html=True)
@@ -557,9 +595,10 @@ with tab3:
         st.markdown(f"""
         <div class="metric-summary">
             <h4>Statistics</h4>
-            <p><strong>Mean:</strong> {df_filtered[selected_kpi].mean():.2f}</p>
-            <p><strong>Median:</strong> {df_filtered[selected_kpi].median():.2f}</p>
-            <p><strong>Std Dev:</strong> {df_filtered[selected_kpi].std():.2f}</p>
+            <p><strong>Mean:</strong> {kpi_hist.mean():.2f}</p>
+            <p><strong>Median:</strong> {median:.2f}</p>
+            <p><strong>P10 / P90:</strong> {p10:.2f} / {p90:.2f}</p>
+            <p><strong>Std Dev:</strong> {kpi_hist.std():.2f}</p>
         </div>
         """, unsafe_allow_html=True)
     
@@ -567,9 +606,9 @@ with tab3:
         st.markdown(f"""
         <div class="metric-summary">
             <h4>Range</h4>
-            <p><strong>Min:</strong> {df_filtered[selected_kpi].min():.2f}</p>
-            <p><strong>Max:</strong> {df_filtered[selected_kpi].max():.2f}</p>
-            <p><strong>Range:</strong> {df_filtered[selected_kpi].max() - df_filtered[selected_kpi].min():.2f}</p>
+            <p><strong>Min:</strong> {kpi_hist.min:.2f}</p>
+            <p><strong>Max:</strong> {kpi_hist.max:.2f}</p>
+            <p><strong>Range:</strong> {kpi_hist.max - kpi_hist.min:.2f}</p>
         </div>
         """, unsafe_allow_html=True)
 
@@ -645,6 +684,13 @@ if alert_count > 0:
 else:
     st.sidebar.success("All Systems Normal")
 
+dispatcher = get_alert_dispatcher()
+if dispatcher.sinks:
+    st.sidebar.caption("Notifications (default thresholds): " + ", ".join(
+        f"{name} {counts['delivered']} sent / {counts['failed']} failed"
+        for name, counts in dispatcher.sink_stats.items()
+    ))
+
 st.sidebar.markdown(f"""
 **Dashboard Metrics:**
 - Data Points: {len(df_filtered):,}
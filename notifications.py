@@ -0,0 +1,264 @@
+import asyncio
+import json
+import os
+import smtplib
+import threading
+import time
+import urllib.request
+from email.message import EmailMessage
+
+
+# Notification sinks
+class WebhookSink:
+    name = 'webhook'
+
+    def __init__(self, url, timeout=5.0, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json'}
+        self.headers.update(headers or {})
+
+    def send(self, batch):
+        payload = json.dumps({'alerts': batch}, default=str).encode('utf-8')
+        request = urllib.request.Request(self.url, data=payload, headers=self.headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SmtpSink:
+    name = 'smtp'
+
+    def __init__(self, host, port, sender, recipients, username=None, password=None,
+                 use_tls=False, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send(self, batch):
+        critical = sum(1 for alert in batch if alert['Status'] == 'critical')
+        message = EmailMessage()
+        message['Subject'] = f"KPI Alerts: {len(batch)} new ({critical} critical)"
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content('\n'.join(
+            f"[{alert['Status'].upper()}] {alert['KPI']}: {alert['Current_Value']} - {alert['Message']}"
+            for alert in batch
+        ))
+
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+def sinks_from_env(environ=None):
+    environ = os.environ if environ is None else environ
+    sinks = []
+
+    if environ.get('KPI_ALERT_WEBHOOK_URL'):
+        sinks.append(WebhookSink(environ['KPI_ALERT_WEBHOOK_URL']))
+
+    if environ.get('KPI_ALERT_SMTP_HOST') and environ.get('KPI_ALERT_SMTP_TO'):
+        sinks.append(SmtpSink(
+            host=environ['KPI_ALERT_SMTP_HOST'],
+            port=int(environ.get('KPI_ALERT_SMTP_PORT', 25)),
+            sender=environ.get('KPI_ALERT_SMTP_FROM', 'kpi-monitor@localhost'),
+            recipients=[r.strip() for r in environ['KPI_ALERT_SMTP_TO'].split(',') if r.strip()],
+            username=environ.get('KPI_ALERT_SMTP_USER'),
+            password=environ.get('KPI_ALERT_SMTP_PASSWORD'),
+            use_tls=environ.get('KPI_ALERT_SMTP_TLS', '').lower() in ('1', 'true', 'yes')
+        ))
+
+    return sinks
+
+
+# Token bucket shared by all batches going to one sink
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Alert notification dispatcher
+class AlertDispatcher:
+    """Turns evaluated alerts into batched notifications on a background event loop.
+
+    One dispatcher is shared by every dashboard session, so an alert episode
+    (a KPI staying at one severity) produces a single notification however
+    many sessions report it, provided they all submit alerts evaluated
+    against the same thresholds. ``submit`` only records state and hands
+    work to the loop thread; it never waits on delivery. Alerts submitted
+    while the dispatcher is stopped are buffered until the next ``start``.
+    """
+
+    def __init__(self, sinks, batch_size=20, batch_interval=2.0, rate_per_minute=30,
+                 max_retries=3, backoff_base=1.0, backoff_max=30.0):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.rate_per_minute = rate_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.stats = {'queued': 0}
+        self.sink_stats = {sink.name: {'delivered': 0, 'failed': 0} for sink in self.sinks}
+        self._lock = threading.Lock()
+        self._episodes = {}
+        self._episode_counter = {}
+        self._buffered = []
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        with self._lock:
+            loop, queue = self._loop, self._queue
+            self._loop = self._queue = None
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+            except RuntimeError:
+                pass
+        self._thread.join(timeout)
+        self._thread = None
+        self._ready.clear()
+
+    def submit(self, alerts, as_of=None):
+        new_alerts = []
+        with self._lock:
+            current = {alert['KPI']: alert['Status'] for alert in alerts}
+
+            # A KPI back to normal (or at another severity) closes its episode
+            for kpi in list(self._episodes):
+                if current.get(kpi) != self._episodes[kpi][0]:
+                    del self._episodes[kpi]
+
+            # Only the submit that opens an episode notifies; repeats from any session are no-ops
+            for alert in alerts:
+                kpi, severity = alert['KPI'], alert['Status']
+                if kpi in self._episodes:
+                    continue
+                episode = self._episode_counter.get((kpi, severity), 0) + 1
+                self._episode_counter[(kpi, severity)] = episode
+                self._episodes[kpi] = (severity, episode)
+                new_alerts.append(dict(alert, Episode=episode, As_Of=as_of))
+
+            self.stats['queued'] += len(new_alerts)
+            self._hand_off(new_alerts)
+        return new_alerts
+
+    def _hand_off(self, alerts):
+        # Called with the lock held; anything the loop cannot take waits for the next start()
+        handed_off = 0
+        if self._loop is not None:
+            try:
+                for alert in alerts:
+                    self._loop.call_soon_threadsafe(self._queue.put_nowait, alert)
+                    handed_off += 1
+            except RuntimeError:
+                self._loop = self._queue = None
+        self._buffered.extend(alerts[handed_off:])
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        queue = asyncio.Queue()
+        with self._lock:
+            for alert in self._buffered:
+                queue.put_nowait(alert)
+            self._buffered = []
+            self._loop, self._queue = loop, queue
+        self._ready.set()
+        try:
+            loop.run_until_complete(self._consume(queue))
+        finally:
+            with self._lock:
+                if self._loop is loop:
+                    self._loop = self._queue = None
+            loop.close()
+
+    async def _consume(self, queue):
+        loop = asyncio.get_running_loop()
+        limiters = {id(sink): RateLimiter(self.rate_per_minute / 60.0) for sink in self.sinks}
+        pending = set()
+
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+
+            # Collect everything that arrives within the batch window
+            batch = [item]
+            deadline = loop.time() + self.batch_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            for sink in self.sinks:
+                task = loop.create_task(self._deliver(sink, batch, limiters[id(sink)]))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            if stopping:
+                break
+
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _deliver(self, sink, batch, limiter):
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, sink.send, batch)
+            except Exception:
+                if attempt == self.max_retries:
+                    break
+                await asyncio.sleep(min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            else:
+                with self._lock:
+                    self.sink_stats[sink.name]['delivered'] += len(batch)
+                return
+
+        with self._lock:
+            self.sink_stats[sink.name]['failed'] += len(batch)
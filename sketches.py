@@ -0,0 +1,312 @@
+import bisect
+import math
+import random
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# Fixed-bin histogram with exact moments
+class FixedHistogram:
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def linear(cls, low, high, nbins):
+        if high <= low:
+            high = low + 1.0
+        return cls(np.linspace(low, high, nbins + 1))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        # Out-of-range values land in the edge bins; min/max stay exact
+        idx = np.clip(np.searchsorted(self.edges, values, side='right') - 1, 0, len(self.counts) - 1)
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histograms with different bin edges")
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        return FixedHistogram(self.edges).merge(self)
+
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def std(self):
+        # Sample standard deviation, matching pandas' default ddof=1
+        if self.count < 2:
+            return math.nan
+        variance = (self.total_sq - self.total ** 2 / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def nonempty(self):
+        nonzero = np.flatnonzero(self.counts)
+        if len(nonzero) == 0:
+            return self.edges[:1], self.counts[:0]
+        first, last = nonzero[0], nonzero[-1] + 1
+        return self.edges[first:last + 1], self.counts[first:last]
+
+
+# KLL streaming quantile sketch
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang & Liberty, 2016).
+
+    Items live in a stack of compactors; level ``h`` items carry weight
+    ``2 ** h``. A full compactor sorts itself and promotes every other item,
+    so memory stays around ``3k`` items regardless of stream length. Coin
+    flips are derived from ``seed``, so identical inputs give identical
+    quantiles.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.seed = seed
+        self.count = 0
+        self.compactors = [[]]
+        self._compactions = 0
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _coin(self):
+        self._compactions += 1
+        return random.Random(self.seed * 1000003 + self._compactions).randint(0, 1)
+
+    def _compress(self):
+        # Lazily compact the lowest full level until the sketch fits again
+        while sum(len(level) for level in self.compactors) >= sum(
+                self._capacity(h) for h in range(len(self.compactors))):
+            for h, level in enumerate(self.compactors):
+                if len(level) >= self._capacity(h):
+                    if h + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    items = sorted(level)
+                    leftover = [items.pop()] if len(items) % 2 else []
+                    self.compactors[h + 1].extend(items[self._coin()::2])
+                    self.compactors[h] = leftover
+                    break
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self.compactors[0].extend(values.tolist())
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self._compress()
+        return self
+
+    def copy(self):
+        return KLLSketch(self.k, self.seed).merge(self)
+
+    def quantiles(self, qs):
+        items = np.array([item for level in self.compactors for item in level])
+        if len(items) == 0:
+            return [math.nan for _ in qs]
+        weights = np.concatenate([np.full(len(level), 2 ** h) for h, level in enumerate(self.compactors)])
+        order = np.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+
+        # Interpolate on each item's starting rank; exact (pandas 'linear') before any compaction
+        ranks = np.cumsum(weights) - weights
+        targets = np.clip(np.asarray(qs, dtype=float), 0, 1) * ranks[-1]
+        return np.interp(targets, ranks, items).tolist()
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+
+def _copy_node(node):
+    return node[0].copy(), node[1].copy()
+
+
+def _merge_node(target, node):
+    target[0].merge(node[0])
+    target[1].merge(node[1])
+    return target
+
+
+# Dyadic rollups over one KPI's buckets
+class _Rollup:
+    """Level ``h`` node ``i`` covers buckets ``[i * 2**h, (i + 1) * 2**h)``.
+
+    Level 0 shares the store's bucket sketches; higher levels hold merged
+    copies, so any window is the merge of at most ``2 * log2(n)`` nodes.
+    """
+
+    def __init__(self, keys, nodes):
+        self.keys = []
+        self.levels = [[]]
+        for key, node in zip(keys, nodes):
+            self.append(key, node)
+
+    def append(self, key, node):
+        position = len(self.keys)
+        self.keys.append(key)
+        self.levels[0].append(node)
+        for h in range(1, len(self.levels)):
+            index = position >> h
+            if index < len(self.levels[h]):
+                _merge_node(self.levels[h][index], node)
+            else:
+                self.levels[h].append(_copy_node(node))
+        if len(self.levels[-1]) > 1:
+            top = self.levels[-1]
+            self.levels.append([_merge_node(_copy_node(top[0]), top[1])])
+
+    def add(self, position, values):
+        # Level 0 is the bucket itself and has already seen the values
+        for h in range(1, len(self.levels)):
+            hist, kll = self.levels[h][position >> h]
+            hist.update(values)
+            kll.update(values)
+
+    def query(self, lo, hi):
+        left, right = [], []
+        h = 0
+        while lo < hi:
+            if lo & 1:
+                left.append(self.levels[h][lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right.append(self.levels[h][hi])
+            lo >>= 1
+            hi >>= 1
+            h += 1
+        return left + right[::-1]
+
+
+# Per-KPI sketches keyed by time bucket
+class KPISketchStore:
+    """Histogram and quantile sketches per KPI and time bucket.
+
+    Bin edges are fixed per KPI, so buckets (and stores built for separate
+    entities) can be merged into any window without touching raw rows.
+    Windows are answered from dyadic rollups and memoized until the next
+    update; returned sketches are shared and must be treated as read-only.
+    """
+
+    max_cached_windows = 256
+
+    def __init__(self, edges_by_kpi, freq='D', k=200):
+        self.edges_by_kpi = {kpi: np.asarray(edges, dtype=float) for kpi, edges in edges_by_kpi.items()}
+        self.freq = freq
+        self.k = k
+        self.buckets = {kpi: {} for kpi in self.edges_by_kpi}
+        self._rollups = {}
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, kpis, time_col='Date', freq='D', nbins=30, k=200):
+        edges = {
+            kpi: FixedHistogram.linear(float(df[kpi].min()), float(df[kpi].max()), nbins).edges
+            for kpi in kpis
+        }
+        store = cls(edges, freq=freq, k=k)
+        for bucket, group in df.groupby(df[time_col].dt.floor(freq)):
+            for kpi in kpis:
+                store.update(kpi, bucket, group[kpi].to_numpy())
+        return store
+
+    def _empty(self, kpi):
+        return FixedHistogram(self.edges_by_kpi[kpi]), KLLSketch(self.k)
+
+    def update(self, kpi, bucket, values):
+        bucket = pd.Timestamp(bucket).floor(self.freq)
+        with self._lock:
+            is_new = bucket not in self.buckets[kpi]
+            if is_new:
+                self.buckets[kpi][bucket] = self._empty(kpi)
+            hist, kll = self.buckets[kpi][bucket]
+            hist.update(values)
+            kll.update(values)
+
+            self._windows = {key: result for key, result in self._windows.items() if key[0] != kpi}
+            rollup = self._rollups.get(kpi)
+            if rollup is None:
+                return
+            if not is_new:
+                rollup.add(bisect.bisect_left(rollup.keys, bucket), values)
+            elif not rollup.keys or bucket > rollup.keys[-1]:
+                rollup.append(bucket, self.buckets[kpi][bucket])
+            else:
+                # Out-of-order bucket; rebuild on the next window query
+                del self._rollups[kpi]
+
+    def merge(self, other):
+        if other.freq != self.freq:
+            raise ValueError(f"Cannot merge stores with bucket frequencies '{self.freq}' and '{other.freq}'")
+        for kpi, edges in other.edges_by_kpi.items():
+            if kpi not in self.edges_by_kpi:
+                raise ValueError(f"Cannot merge sketches for unknown KPI '{kpi}'")
+            if not np.array_equal(self.edges_by_kpi[kpi], edges):
+                raise ValueError(f"Cannot merge '{kpi}' sketches with different bin edges")
+
+        with self._lock:
+            for kpi, buckets in other.buckets.items():
+                for bucket, node in buckets.items():
+                    if bucket in self.buckets[kpi]:
+                        _merge_node(self.buckets[kpi][bucket], node)
+                    else:
+                        self.buckets[kpi][bucket] = _copy_node(node)
+            self._rollups = {}
+            self._windows = {}
+        return self
+
+    def window(self, kpi, start=None, end=None):
+        # Windows are resolved at bucket granularity
+        start = pd.Timestamp(start).floor(self.freq) if start is not None else None
+        end = pd.Timestamp(end).floor(self.freq) if end is not None else None
+
+        with self._lock:
+            rollup = self._rollups.get(kpi)
+            if rollup is None:
+                keys = sorted(self.buckets[kpi])
+                rollup = self._rollups[kpi] = _Rollup(keys, [self.buckets[kpi][key] for key in keys])
+
+            lo = 0 if start is None else bisect.bisect_left(rollup.keys, start)
+            hi = len(rollup.keys) if end is None else bisect.bisect_right(rollup.keys, end)
+            key = (kpi, lo, hi)
+            if key not in self._windows:
+                if len(self._windows) >= self.max_cached_windows:
+                    self._windows = {}
+                result = self._empty(kpi)
+                for node in rollup.query(lo, max(lo, hi)):
+                    _merge_node(result, node)
+                self._windows[key] = result
+            return self._windows[key]
@@ -0,0 +1,319 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from notifications import AlertDispatcher, RateLimiter, SmtpSink, WebhookSink, sinks_from_env
+
+
+def make_alert(kpi, status='warning', value=1.0):
+    return {'KPI': kpi, 'Status': status, 'Current_Value': value, 'Message': f'{kpi} {status}'}
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+# Local stand-in servers
+@pytest.fixture
+def webhook_server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            if server.fail_next > 0:
+                server.fail_next -= 1
+                self.send_response(500)
+                self.end_headers()
+                return
+            server.received.append(json.loads(body))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.received = []
+    server.fail_next = 0
+    server.url = f'http://127.0.0.1:{server.server_port}/hook'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def smtp_server():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    messages = []
+
+    def handle(conn):
+        stream = conn.makefile('rwb')
+
+        def reply(line):
+            stream.write(line.encode() + b'\r\n')
+            stream.flush()
+
+        reply('220 stub ready')
+        while True:
+            line = stream.readline().decode().rstrip('\r\n')
+            if not line:
+                break
+            command = line.split(' ')[0].upper()
+            if command == 'DATA':
+                reply('354 end with .')
+                lines = []
+                while True:
+                    data = stream.readline().decode()
+                    if data.rstrip('\r\n') == '.':
+                        break
+                    lines.append(data)
+                messages.append(''.join(lines))
+                reply('250 queued')
+            elif command == 'QUIT':
+                reply('221 bye')
+                break
+            else:
+                reply('250 ok')
+        conn.close()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield listener.getsockname()[1], messages
+    listener.close()
+
+
+@pytest.fixture
+def dispatcher_factory():
+    dispatchers = []
+
+    def factory(sinks, **kwargs):
+        kwargs.setdefault('batch_interval', 0.1)
+        kwargs.setdefault('backoff_base', 0.01)
+        kwargs.setdefault('rate_per_minute', 6000)
+        dispatcher = AlertDispatcher(sinks, **kwargs).start()
+        dispatchers.append(dispatcher)
+        return dispatcher
+
+    yield factory
+    for dispatcher in dispatchers:
+        dispatcher.stop()
+
+
+# Sinks
+def test_webhook_sink_posts_json_batch(webhook_server):
+    WebhookSink(webhook_server.url).send([make_alert('ROI')])
+
+    assert webhook_server.received == [{'alerts': [make_alert('ROI')]}]
+
+
+def test_smtp_sink_sends_summary_email(smtp_server):
+    port, messages = smtp_server
+    sink = SmtpSink('127.0.0.1', port, 'kpi@example.com', ['ops@example.com'])
+
+    sink.send([make_alert('ROI', 'warning', 12.5), make_alert('Revenue', 'critical', 700000)])
+
+    assert len(messages) == 1
+    assert 'Subject: KPI Alerts: 2 new (1 critical)' in messages[0]
+    assert '[CRITICAL] Revenue: 700000' in messages[0]
+
+
+def test_sinks_from_env():
+    sinks = sinks_from_env({
+        'KPI_ALERT_WEBHOOK_URL': 'http://localhost/hook',
+        'KPI_ALERT_SMTP_HOST': 'localhost',
+        'KPI_ALERT_SMTP_TO': 'a@example.com, b@example.com',
+    })
+
+    assert [sink.name for sink in sinks] == ['webhook', 'smtp']
+    assert sinks[1].recipients == ['a@example.com', 'b@example.com']
+    assert sinks_from_env({}) == []
+
+
+# Dispatcher
+def test_repeated_submits_notify_once(webhook_server, smtp_server, dispatcher_factory):
+    port, messages = smtp_server
+    dispatcher = dispatcher_factory([
+        WebhookSink(webhook_server.url),
+        SmtpSink('127.0.0.1', port, 'kpi@example.com', ['ops@example.com']),
+    ])
+    alerts = [make_alert('ROI'), make_alert('Revenue', 'critical')]
+
+    sessions = [threading.Thread(target=dispatcher.submit, args=(alerts,)) for _ in range(20)]
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+
+    assert wait_until(lambda: len(webhook_server.received) == 1 and len(messages) == 1)
+    time.sleep(0.3)
+    assert len(webhook_server.received) == 1
+    assert len(webhook_server.received[0]['alerts']) == 2
+    assert dispatcher.stats['queued'] == 2
+    assert dispatcher.sink_stats == {
+        'webhook': {'delivered': 2, 'failed': 0},
+        'smtp': {'delivered': 2, 'failed': 0},
+    }
+
+
+def test_new_episode_after_kpi_recovers():
+    dispatcher = AlertDispatcher([])
+
+    first = dispatcher.submit([make_alert('ROI')])
+    assert dispatcher.submit([make_alert('ROI')]) == []
+    assert dispatcher.submit([]) == []
+    second = dispatcher.submit([make_alert('ROI')])
+
+    assert [alert['Episode'] for alert in first + second] == [1, 2]
+
+
+def test_severity_change_opens_new_episode():
+    dispatcher = AlertDispatcher([])
+
+    dispatcher.submit([make_alert('ROI', 'warning')])
+    escalated = dispatcher.submit([make_alert('ROI', 'critical')])
+    repeated = dispatcher.submit([make_alert('ROI', 'critical')])
+
+    assert [(alert['Status'], alert['Episode']) for alert in escalated] == [('critical', 1)]
+    assert repeated == []
+    assert dispatcher._episodes == {'ROI': ('critical', 1)}
+
+
+def test_batches_split_by_batch_size(webhook_server, dispatcher_factory):
+    dispatcher = dispatcher_factory([WebhookSink(webhook_server.url)], batch_size=2, batch_interval=0.5)
+
+    dispatcher.submit([make_alert(f'KPI_{i}') for i in range(5)])
+
+    assert wait_until(lambda: sum(len(batch['alerts']) for batch in webhook_server.received) == 5)
+    assert sorted(len(batch['alerts']) for batch in webhook_server.received) == [1, 2, 2]
+
+
+def test_batch_interval_groups_separate_submits(webhook_server, dispatcher_factory):
+    dispatcher = dispatcher_factory([WebhookSink(webhook_server.url)], batch_interval=0.3)
+
+    dispatcher.submit([make_alert('ROI')])
+    dispatcher.submit([make_alert('ROI'), make_alert('Revenue')])
+
+    assert wait_until(lambda: len(webhook_server.received) == 1)
+    assert len(webhook_server.received[0]['alerts']) == 2
+
+
+def test_retry_recovers_from_transient_failures(webhook_server, dispatcher_factory):
+    webhook_server.fail_next = 2
+    dispatcher = dispatcher_factory([WebhookSink(webhook_server.url)], max_retries=3)
+
+    dispatcher.submit([make_alert('ROI')])
+
+    assert wait_until(lambda: dispatcher.sink_stats['webhook']['delivered'] == 1)
+    assert dispatcher.sink_stats['webhook']['failed'] == 0
+    assert len(webhook_server.received) == 1
+
+
+def test_retries_exhausted_counts_failure(dispatcher_factory):
+    class FlakySink:
+        name = 'flaky'
+
+        def __init__(self):
+            self.attempts = []
+
+        def send(self, batch):
+            self.attempts.append(time.monotonic())
+            raise ConnectionError('down')
+
+    sink = FlakySink()
+    dispatcher = dispatcher_factory([sink], max_retries=2, backoff_base=0.05)
+
+    dispatcher.submit([make_alert('ROI'), make_alert('Revenue')])
+
+    assert wait_until(lambda: dispatcher.sink_stats['flaky']['failed'] == 2)
+    assert len(sink.attempts) == 3
+    gaps = [later - earlier for earlier, later in zip(sink.attempts, sink.attempts[1:])]
+    assert gaps[0] >= 0.04 and gaps[1] >= 0.09
+
+
+def test_rate_limiter_spaces_acquisitions():
+    async def acquire_all():
+        limiter = RateLimiter(rate=20, burst=2)
+        start = time.monotonic()
+        for _ in range(6):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    # Two tokens are available up front, the other four refill at 20/s
+    assert asyncio.run(acquire_all()) >= 0.18
+
+
+def test_submit_does_not_wait_for_delivery(dispatcher_factory):
+    class SlowSink:
+        name = 'slow'
+
+        def send(self, batch):
+            time.sleep(1.0)
+
+    dispatcher = dispatcher_factory([SlowSink()], batch_interval=0)
+
+    start = time.monotonic()
+    dispatcher.submit([make_alert('ROI')])
+    dispatcher.submit([make_alert('Revenue')])
+
+    assert time.monotonic() - start < 0.1
+
+
+def test_restart_after_stop_delivers(webhook_server, dispatcher_factory):
+    dispatcher = dispatcher_factory([WebhookSink(webhook_server.url)])
+    dispatcher.stop()
+
+    dispatcher.start()
+    assert not dispatcher._loop.is_closed()
+    dispatcher.submit([make_alert('ROI')])
+
+    assert wait_until(lambda: len(webhook_server.received) == 1)
+    assert webhook_server.received[0]['alerts'][0]['KPI'] == 'ROI'
+
+
+def test_alerts_submitted_while_stopped_are_buffered(webhook_server, dispatcher_factory):
+    dispatcher = AlertDispatcher([WebhookSink(webhook_server.url)], batch_interval=0.1)
+
+    dispatcher.submit([make_alert('ROI')])
+    assert dispatcher.submit([make_alert('ROI')]) == []
+    dispatcher.start()
+    try:
+        assert wait_until(lambda: len(webhook_server.received) == 1)
+        dispatcher.stop()
+        dispatcher.submit([make_alert('ROI'), make_alert('Revenue')])
+        dispatcher.start()
+        assert wait_until(lambda: len(webhook_server.received) == 2)
+    finally:
+        dispatcher.stop()
+
+    assert [[alert['KPI'] for alert in batch['alerts']] for batch in webhook_server.received] == [['ROI'], ['Revenue']]
+
+
+def test_closed_loop_does_not_lose_alerts():
+    dispatcher = AlertDispatcher([])
+    closed = asyncio.new_event_loop()
+    closed.close()
+    dispatcher._loop, dispatcher._queue = closed, asyncio.Queue()
+
+    submitted = dispatcher.submit([make_alert('ROI')])
+
+    assert dispatcher._loop is None
+    assert dispatcher._buffered == submitted
@@ -0,0 +1,213 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import FixedHistogram, KLLSketch, KPISketchStore
+
+
+@pytest.fixture
+def kpi_frame():
+    rng = np.random.default_rng(7)
+    dates = pd.date_range('2024-01-01 09:30', periods=400, freq='D')
+    return pd.DataFrame({
+        'Date': dates,
+        'Revenue': rng.normal(1_000_000, 100_000, len(dates)),
+        'ROI': rng.uniform(10, 30, len(dates)),
+    })
+
+
+def rank_error(data, value, q):
+    data = np.sort(data)
+    low = np.searchsorted(data, value, side='left') / len(data)
+    high = np.searchsorted(data, value, side='right') / len(data)
+    return 0.0 if low <= q <= high else min(abs(q - low), abs(q - high))
+
+
+# FixedHistogram
+def test_histogram_matches_numpy_and_pandas():
+    values = np.random.default_rng(1).normal(50, 10, 5000)
+    hist = FixedHistogram.linear(values.min(), values.max(), 30).update(values)
+
+    expected, _ = np.histogram(values, bins=hist.edges)
+    assert hist.counts.tolist() == expected.tolist()
+    assert hist.mean() == pytest.approx(pd.Series(values).mean())
+    assert hist.std() == pytest.approx(pd.Series(values).std())
+    assert (hist.min, hist.max) == (values.min(), values.max())
+
+
+def test_histogram_clips_out_of_range_values_into_edge_bins():
+    hist = FixedHistogram.linear(0, 10, 5).update([-5, 3, 25])
+
+    assert hist.counts.tolist() == [1, 1, 0, 0, 1]
+    assert (hist.min, hist.max) == (-5, 25)
+
+
+def test_histogram_merge_rejects_mismatched_edges():
+    with pytest.raises(ValueError):
+        FixedHistogram.linear(0, 10, 5).merge(FixedHistogram.linear(0, 20, 5))
+
+
+def test_empty_histogram():
+    hist = FixedHistogram.linear(0, 10, 5).update([])
+
+    assert hist.count == 0
+    assert math.isnan(hist.mean()) and math.isnan(hist.std())
+    edges, counts = hist.nonempty()
+    assert len(counts) == 0
+
+
+# KLLSketch
+def test_kll_is_exact_below_k():
+    values = np.random.default_rng(2).exponential(3, 150)
+    sketch = KLLSketch(k=200).update(values)
+
+    qs = [0, 0.1, 0.25, 0.5, 0.9, 1]
+    assert sketch.quantiles(qs) == pytest.approx(np.quantile(values, qs).tolist())
+
+
+def test_kll_rank_error_is_bounded_above_k():
+    values = np.random.default_rng(3).normal(0, 1, 50_000)
+    sketch = KLLSketch(k=200)
+    for chunk in np.array_split(values, 500):
+        sketch.update(chunk)
+
+    assert sketch.count == len(values)
+    assert sum(len(level) for level in sketch.compactors) < 3 * sketch.k
+    for q in [0.01, 0.1, 0.5, 0.9, 0.99]:
+        assert rank_error(values, sketch.quantile(q), q) < 0.02
+
+
+def test_kll_is_deterministic():
+    values = np.random.default_rng(4).normal(0, 1, 10_000)
+
+    first = KLLSketch(k=50).update(values).quantiles([0.1, 0.5, 0.9])
+    second = KLLSketch(k=50).update(values).quantiles([0.1, 0.5, 0.9])
+
+    assert first == second
+
+
+def test_kll_merge_matches_single_pass():
+    values = np.random.default_rng(5).normal(0, 1, 20_000)
+    single = KLLSketch(k=200).update(values)
+    merged = KLLSketch(k=200)
+    for part in np.array_split(values, 40):
+        merged.merge(KLLSketch(k=200).update(part))
+
+    assert merged.count == single.count
+    for q in [0.05, 0.5, 0.95]:
+        assert rank_error(values, merged.quantile(q), q) < 0.02
+        assert rank_error(values, single.quantile(q), q) < 0.02
+
+
+def test_empty_kll():
+    assert all(math.isnan(value) for value in KLLSketch().quantiles([0.1, 0.5]))
+
+
+# KPISketchStore
+@pytest.mark.parametrize('days', [7, 30, 150, 399])
+def test_store_window_matches_pandas(kpi_frame, days):
+    store = KPISketchStore.from_frame(kpi_frame, ['Revenue', 'ROI'])
+    start = kpi_frame['Date'].max() - pd.Timedelta(days=days)
+    subset = kpi_frame.loc[kpi_frame['Date'] >= start, 'Revenue']
+
+    hist, quantiles = store.window('Revenue', start)
+
+    assert hist.count == len(subset)
+    assert hist.counts.tolist() == np.histogram(subset, bins=hist.edges)[0].tolist()
+    assert hist.mean() == pytest.approx(subset.mean())
+    assert hist.std() == pytest.approx(subset.std())
+    assert (hist.min, hist.max) == (subset.min(), subset.max())
+    if len(subset) < store.k:
+        assert quantiles.quantile(0.5) == pytest.approx(subset.median())
+    else:
+        assert rank_error(subset.to_numpy(), quantiles.quantile(0.5), 0.5) < 0.02
+
+
+def test_store_windows_are_stable_and_memoized(kpi_frame):
+    start = kpi_frame['Date'].max() - pd.Timedelta(days=365)
+    medians = {
+        KPISketchStore.from_frame(kpi_frame, ['Revenue']).window('Revenue', start)[1].quantile(0.5)
+        for _ in range(3)
+    }
+    store = KPISketchStore.from_frame(kpi_frame, ['Revenue'])
+
+    assert len(medians) == 1
+    assert store.window('Revenue', start) is store.window('Revenue', start)
+
+
+def test_store_rollup_windows_match_direct_merge(kpi_frame):
+    store = KPISketchStore.from_frame(kpi_frame, ['ROI'])
+    keys = sorted(store.buckets['ROI'])
+    rng = np.random.default_rng(6)
+
+    for _ in range(25):
+        lo, hi = sorted(rng.integers(0, len(keys), 2))
+        hist, _ = store.window('ROI', keys[lo], keys[hi])
+        direct = FixedHistogram(store.edges_by_kpi['ROI'])
+        for key in keys[lo:hi + 1]:
+            direct.merge(store.buckets['ROI'][key][0])
+        assert hist.counts.tolist() == direct.counts.tolist()
+        assert hist.total == pytest.approx(direct.total)
+
+
+def test_store_streaming_updates_refresh_windows(kpi_frame):
+    store = KPISketchStore.from_frame(kpi_frame, ['ROI'])
+    last = kpi_frame['Date'].max()
+    before, _ = store.window('ROI')
+
+    store.update('ROI', last + pd.Timedelta(days=1), [20.0])
+    store.update('ROI', last, [21.0, 22.0])
+    store.update('ROI', kpi_frame['Date'].min() - pd.Timedelta(days=1), [23.0])
+    after, quantiles = store.window('ROI')
+
+    assert after.count == before.count + 4
+    assert after.total == pytest.approx(before.total + 86.0)
+    assert store.window('ROI', last)[0].count == 4
+    assert quantiles.count == after.count
+
+
+def test_store_merge_matches_single_pass(kpi_frame):
+    kpis = ['Revenue', 'ROI']
+    whole = KPISketchStore.from_frame(kpi_frame, kpis)
+    edges = whole.edges_by_kpi
+    east, west = KPISketchStore(edges), KPISketchStore(edges)
+    for i, row in kpi_frame.iterrows():
+        for kpi in kpis:
+            (east if i % 2 else west).update(kpi, row['Date'], [row[kpi]])
+    start = kpi_frame['Date'].max() - pd.Timedelta(days=60)
+    east.window('ROI', start)
+
+    merged = east.merge(west)
+
+    for kpi in kpis:
+        expected_hist, expected_quantiles = whole.window(kpi, start)
+        hist, quantiles = merged.window(kpi, start)
+        assert hist.counts.tolist() == expected_hist.counts.tolist()
+        assert hist.mean() == pytest.approx(expected_hist.mean())
+        assert quantiles.quantiles([0.1, 0.5, 0.9]) == pytest.approx(expected_quantiles.quantiles([0.1, 0.5, 0.9]))
+
+
+def test_store_merge_rejects_incompatible_stores(kpi_frame):
+    store = KPISketchStore.from_frame(kpi_frame, ['Revenue'])
+
+    with pytest.raises(ValueError, match='unknown KPI'):
+        store.merge(KPISketchStore.from_frame(kpi_frame, ['Revenue', 'ROI']))
+    with pytest.raises(ValueError, match='different bin edges'):
+        store.merge(KPISketchStore.from_frame(kpi_frame, ['Revenue'], nbins=10))
+    with pytest.raises(ValueError, match='frequencies'):
+        store.merge(KPISketchStore.from_frame(kpi_frame, ['Revenue'], freq='7D'))
+
+
+def test_store_empty_windows(kpi_frame):
+    store = KPISketchStore.from_frame(kpi_frame, ['ROI'])
+    future = kpi_frame['Date'].max() + pd.Timedelta(days=30)
+
+    hist, quantiles = store.window('ROI', future)
+    empty_store_hist, _ = KPISketchStore({'ROI': [0, 1, 2]}).window('ROI')
+
+    assert hist.count == 0 and empty_store_hist.count == 0
+    assert math.isnan(hist.mean())
+    assert math.isnan(quantiles.quantile(0.5))
+    assert store.window('ROI', future, future - pd.Timedelta(days=5))[0].count == 0